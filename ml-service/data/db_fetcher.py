@@ -1,6 +1,7 @@
 import os
-import psycopg2
+import threading
 import pandas as pd
+import adbc_driver_postgresql.dbapi as adbc
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -11,9 +12,32 @@ class DBFetcher:
         self.db_url = os.getenv("DATABASE_URL")
         if not self.db_url:
             raise ValueError("DATABASE_URL environment variable is not set")
+        # Created on first get_connection(), so fetchers that never query
+        # don't hold a connection
+        self.conn = None
+        self._conn_lock = threading.Lock()
 
     def get_connection(self):
-        return psycopg2.connect(self.db_url)
+        """
+        Shared ADBC connection: result sets stream over binary COPY straight
+        into Arrow. autocommit keeps it from sitting idle in transaction
+        between fetches; close() releases it.
+        """
+        with self._conn_lock:
+            if self.conn is None:
+                self.conn = adbc.connect(self.db_url, autocommit=True)
+        return self.conn
+
+    def close(self):
+        with self._conn_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def _fetch_frame(self, query):
+        with self.get_connection().cursor() as cur:
+            cur.execute(query)
+            return cur.fetch_arrow_table().to_pandas()
 
     def fetch_deliveries(self):
         """Fetch all delivery records with related vehicle and route info."""
@@ -28,25 +52,17 @@ class DBFetcher:
             JOIN vehicles v ON d."vehicleId" = v.id
             JOIN premises p_origin ON d."originId" = p_origin.id
             JOIN premises p_dest ON d."destinationId" = p_dest.id
-            ORDER BY d."deliveryDate" ASC;
+            ORDER BY d."deliveryDate" ASC
         """
-        conn = self.get_connection()
-        try:
-            df = pd.read_sql_query(query, conn)
-            # Ensure date is datetime
-            df['deliveryDate'] = pd.to_datetime(df['deliveryDate'])
-            return df
-        finally:
-            conn.close()
+        df = self._fetch_frame(query)
+        # Columns normally arrive typed; only parse dates if they did not
+        if not pd.api.types.is_datetime64_any_dtype(df['deliveryDate']):
+            df['deliveryDate'] = pd.to_datetime(df['deliveryDate'], cache=True)
+        return df
 
     def fetch_vehicles(self):
         """Fetch all vehicles."""
-        query = 'SELECT * FROM vehicles;'
-        conn = self.get_connection()
-        try:
-            return pd.read_sql_query(query, conn)
-        finally:
-            conn.close()
+        return self._fetch_frame('SELECT * FROM vehicles')
 
 if __name__ == "__main__":
     # Test execution
@@ -1,48 +1,89 @@
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+import numpy as np
+from numba import njit
 import joblib
 
+@njit(cache=True)
+def bucket_sum(day_idx, vals, n_days):
+    """Sum vals into a dense array of n_days buckets (missing days stay 0)."""
+    out = np.zeros(n_days)
+    for i in range(day_idx.size):
+        out[day_idx[i]] += vals[i]
+    return out
+
+@njit(cache=True)
+def dual_bucket_sum(day_idx, vals1, vals2, n_days):
+    """bucket_sum for two value columns in a single pass."""
+    out1 = np.zeros(n_days)
+    out2 = np.zeros(n_days)
+    for i in range(day_idx.size):
+        out1[day_idx[i]] += vals1[i]
+        out2[day_idx[i]] += vals2[i]
+    return out1, out2
+
 class Preprocessor:
     def __init__(self):
-        self.le_vehicle = LabelEncoder()
-        self.le_origin = LabelEncoder()
+        # id -> code mappings learned in prepare_rf_data, handed to the model for predict time
+        self.vehicle_mapping = {}
+        self.origin_mapping = {}
         
     def prepare_arima_data(self, df, column='demand'):
         """
         Aggregate to daily level for ARIMA.
         Returns Series indexed by date.
         """
-        # Ensure daily frequency, fill missing with 0
-        daily = df.groupby(df['deliveryDate'].dt.date)[column].sum()
-        daily.index = pd.to_datetime(daily.index)
-        daily = daily.asfreq('D').fillna(0)
-        return daily
+        # Bucket by integer day offset; the dense result is already daily
+        # frequency with missing days filled with 0
+        day_idx, index = self._day_buckets(df)
+        daily = bucket_sum(day_idx, df[column].to_numpy(dtype=np.float64), len(index))
+        return pd.Series(daily, index=index, name=column)
+
+    def prepare_arima_pair(self, df, first='demand', second='totalCost'):
+        """
+        prepare_arima_data for two columns, sharing one day-index
+        computation and one aggregation pass over the frame.
+        """
+        day_idx, index = self._day_buckets(df)
+        daily1, daily2 = dual_bucket_sum(
+            day_idx, df[first].to_numpy(dtype=np.float64), df[second].to_numpy(dtype=np.float64), len(index)
+        )
+        return pd.Series(daily1, index=index, name=first), pd.Series(daily2, index=index, name=second)
+
+    def _day_buckets(self, df):
+        """Integer day offset of each row, plus the dense daily index they map into."""
+        days = df['deliveryDate'].to_numpy().astype('datetime64[D]')
+        min_day = days.min()
+        n_days = int((days.max() - min_day).astype(np.int64)) + 1
+        day_idx = (days - min_day).astype(np.int64)
+        return day_idx, pd.date_range(min_day, periods=n_days, freq='D', name='deliveryDate')
 
     def prepare_rf_data(self, df):
         """
         Prepare features for Supplier Reliability Random Forest.
         Target: on_time (derived from hasOvertime - if overtime=True, reliability=0, else 1)
         """
-        features = df.copy()
-        
         # Target: 0 if overtime/delayed, 1 if on time
-        features['target'] = features['hasOvertime'].apply(lambda x: 0 if x else 1)
-        
-        # Feature Engineering
-        features['day_of_week'] = features['deliveryDate'].dt.dayofweek
-        features['month'] = features['deliveryDate'].dt.month
+        target = (~df['hasOvertime'].to_numpy(dtype=bool)).astype(np.int8)
         
         # Encoding categorical variables
-        # Using codes for simplicity in this RF model
-        features['vehicle_encoded'] = features['vehicleId'].astype('category').cat.codes
-        features['origin_encoded'] = features['originId'].astype('category').cat.codes
-        features['is_alpine_int'] = features['isAlpine'].astype(int)
+        # Using codes for simplicity in this RF model; sorted so a code always
+        # means the same ID across restarts (dashboard scenarios hard-code them)
+        vehicle_codes, vehicle_uniques = pd.factorize(df['vehicleId'], sort=True)
+        origin_codes, origin_uniques = pd.factorize(df['originId'], sort=True)
+        self.vehicle_mapping = dict(zip(vehicle_uniques, range(len(vehicle_uniques))))
+        self.origin_mapping = dict(zip(origin_uniques, range(len(origin_uniques))))
         
-        # Select final vectors
-        X = features[[
-            'vehicle_encoded', 'origin_encoded', 'distance', 'demand', 
-            'is_alpine_int', 'day_of_week', 'month'
-        ]]
-        y = features['target']
+        # Build the final vectors directly from column arrays instead of
+        # copying the whole frame; small-range features are downcast to int8
+        X = pd.DataFrame({
+            'vehicle_encoded': vehicle_codes,
+            'origin_encoded': origin_codes,
+            'distance': df['distance'].to_numpy(),
+            'demand': df['demand'].to_numpy(),
+            'is_alpine_int': df['isAlpine'].to_numpy(dtype=np.int8),
+            'day_of_week': df['deliveryDate'].dt.dayofweek.to_numpy(dtype=np.int8),
+            'month': df['deliveryDate'].dt.month.to_numpy(dtype=np.int8)
+        }, index=df.index)
+        y = pd.Series(target, index=df.index, name='target')
         
-        return X, y, features[['id', 'vehicleId', 'originId']] # Return identifiers for mapping results
+        return X, y, df[['id', 'vehicleId', 'originId']] # Return identifiers for mapping results
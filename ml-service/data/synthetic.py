@@ -1,11 +1,12 @@
 import pandas as pd
 import numpy as np
-from datetime import timedelta
-import random
 
 class SyntheticGenerator:
-    def __init__(self, original_df):
+    def __init__(self, original_df, seed=42):
         self.original_df = original_df
+        # Fixed seed: the same real data always yields the same augmented
+        # history, so caches keyed on the resulting series can hit
+        self.seed = seed
 
     def generate_historical_data(self, target_days=365):
         """
@@ -15,7 +16,9 @@ class SyntheticGenerator:
         if self.original_df.empty:
             return pd.DataFrame()
 
-        df = self.original_df.copy()
+        # Canonical row order, so the seeded draws don't depend on how the
+        # database happened to order ties
+        df = self.original_df.sort_values(['deliveryDate', 'id'], kind='stable', ignore_index=True)
         earliest_date = df['deliveryDate'].min()
         latest_date = df['deliveryDate'].max()
         
@@ -34,57 +37,56 @@ class SyntheticGenerator:
         std_cost = df['totalCost'].std()
         
         # Get list of existing IDs to sample from
-        vehicle_ids = df['vehicleId'].unique()
-        origin_ids = df['originId'].unique()
-        dest_ids = df['destinationId'].unique()
-        
-        new_rows = []
-        
+        vehicle_ids = np.sort(df['vehicleId'].unique())
+        origin_ids = np.sort(df['originId'].unique())
+        dest_ids = np.sort(df['destinationId'].unique())
+        rng = np.random.default_rng(self.seed)
+
+        # Daily volume with some randomness (Poisson-ish), drawn for all days at once
+        n_per_day = np.maximum(1, rng.normal(daily_vol, daily_vol * 0.2, days_needed).astype(int))
+        total = int(n_per_day.sum())
+
         # Generate backwards from earliest date
-        current_synth_date = earliest_date
-        
-        for i in range(days_needed):
-            current_synth_date = current_synth_date - timedelta(days=1)
-            
-            # Daily volume with some randomness (Poisson-ish)
-            n_deliveries = max(1, int(np.random.normal(daily_vol, daily_vol * 0.2)))
-            
-            for _ in range(n_deliveries):
-                # Sample random attributes from existing distribution
-                vid = np.random.choice(vehicle_ids)
-                oid = np.random.choice(origin_ids)
-                did = np.random.choice(dest_ids)
-                
-                # Sample a "template" row for realistic correlations (e.g. vehicle type matching ID)
-                template = df[df['vehicleId'] == vid].sample(1).iloc[0]
-                
-                # Add some noise to numericals
-                noise = np.random.normal(1, 0.1) # 10% variance
-                cost = template['totalCost'] * noise
-                demand = int(template['demand'] * noise)
-                distance = template['distance'] # Distance is fixed between points usually, keeping it simple
-                
-                row = {
-                    'id': f'synth_{i}_{_}',
-                    'originId': oid,
-                    'destinationId': did,
-                    'vehicleId': vid,
-                    'demand': demand,
-                    'distance': distance,
-                    'totalCost': cost,
-                    'deliveryDate': current_synth_date,
-                    'isAlpine': template['isAlpine'],
-                    'hasOvertime': 1 if random.random() < 0.1 else 0, # 10% chance of overtime
-                    'vehicleType': template['vehicleType'],
-                    'originCategory': template['originCategory'],
-                    'destinationCategory': template['destinationCategory'] 
-                }
-                new_rows.append(row)
+        day_offsets = np.arange(days_needed)
+        synth_dates = earliest_date - pd.to_timedelta(day_offsets + 1, unit='D')
+        day_of_row = np.repeat(day_offsets, n_per_day)
+        row_in_day = np.arange(total) - np.repeat(np.cumsum(n_per_day) - n_per_day, n_per_day)
+
+        # Sample random attributes from existing distribution
+        vid_idx = rng.integers(0, len(vehicle_ids), total)
+        vids = vehicle_ids[vid_idx]
+        oids = origin_ids[rng.integers(0, len(origin_ids), total)]
+        dids = dest_ids[rng.integers(0, len(dest_ids), total)]
+
+        # Sample a "template" row per synthetic row for realistic correlations
+        # (e.g. vehicle type matching ID). Rows are grouped by vehicle once; a
+        # template is then a random offset inside its vehicle's group.
+        vehicle_codes = pd.Index(vehicle_ids).get_indexer(df['vehicleId'])
+        rows_by_vehicle = np.argsort(vehicle_codes, kind='stable')
+        group_sizes = np.bincount(vehicle_codes, minlength=len(vehicle_ids))
+        group_starts = np.cumsum(group_sizes) - group_sizes
+        offsets = (rng.random(total) * group_sizes[vid_idx]).astype(np.int64)
+        template_idx = rows_by_vehicle[group_starts[vid_idx] + offsets]
+
+        # Add some noise to numericals
+        noise = rng.normal(1, 0.1, total) # 10% variance
+
+        synthetic_df = pd.DataFrame({
+            'id': [f'synth_{i}_{j}' for i, j in zip(day_of_row, row_in_day)],
+            'originId': oids,
+            'destinationId': dids,
+            'vehicleId': vids,
+            'demand': (df['demand'].to_numpy()[template_idx] * noise).astype(int),
+            'distance': df['distance'].to_numpy()[template_idx], # Distance is fixed between points usually, keeping it simple
+            'totalCost': df['totalCost'].to_numpy()[template_idx] * noise,
+            'deliveryDate': synth_dates.repeat(n_per_day),
+            'isAlpine': df['isAlpine'].to_numpy()[template_idx],
+            'hasOvertime': (rng.random(total) < 0.1).astype(int), # 10% chance of overtime
+            'vehicleType': df['vehicleType'].to_numpy()[template_idx],
+            'originCategory': df['originCategory'].to_numpy()[template_idx],
+            'destinationCategory': df['destinationCategory'].to_numpy()[template_idx]
+        })
 
-        synthetic_df = pd.DataFrame(new_rows)
-        # Ensure datetime type
-        synthetic_df['deliveryDate'] = pd.to_datetime(synthetic_df['deliveryDate'])
-        
         # Combine and sort
         combined_df = pd.concat([synthetic_df, df], ignore_index=True)
         combined_df = combined_df.sort_values('deliveryDate')
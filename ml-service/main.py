@@ -1,9 +1,15 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import pandas as pd
 import numpy as np
 import os
+import datetime
+from math import isnan, isfinite
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
 from typing import List, Optional
 
 from data.db_fetcher import DBFetcher
@@ -21,13 +27,56 @@ models = {
 data_context = {
     "latest_date": None,
     "rf_accuracy": 0.0,
-    "total_records": 0
+    "total_records": 0,
+    "reliability_version": 0 # bumped whenever a new reliability model is installed
 }
 
+def _train_demand(demand_series, arima_pool):
+    print("Training Demand Model...")
+    try:
+        demand_model = ArimaModel()
+        if demand_model.train(demand_series, executor=arima_pool):
+            models["demand"] = demand_model
+            models["demand_history"] = demand_series
+            print("Demand Model Trained.")
+        else:
+            print("Demand Model Failed to Train.")
+    except Exception as e:
+        print(f"FAILED Demand Model: {e}")
+
+def _train_spend(spend_series, arima_pool):
+    print("Training Spend Model...")
+    try:
+        spend_model = ArimaModel()
+        if spend_model.train(spend_series, executor=arima_pool):
+            models["spend"] = spend_model
+            models["spend_history"] = spend_series
+            print("Spend Model Trained.")
+        else:
+            print("Spend Model Failed to Train.")
+    except Exception as e:
+        print(f"FAILED Spend Model: {e}")
+
+def _train_rf(prep, full_df):
+    print("Training Reliability Model...")
+    try:
+        X, y, identifiers = prep.prepare_rf_data(full_df)
+        rf_model = SupplierReliabilityModel()
+        metrics = rf_model.train(X, y)
+        rf_model.vehicle_mapping = prep.vehicle_mapping
+        rf_model.origin_mapping = prep.origin_mapping
+        models["reliability"] = rf_model
+        data_context["reliability_version"] += 1
+        data_context["rf_accuracy"] = metrics['accuracy']
+        print(f"RF Accuracy: {metrics['accuracy']:.2f}")
+    except Exception as e:
+        print(f"FAILED Reliability Model: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Load data and train models
     print("Starting ML Service...")
+    fetcher = None
     try:
         # 1. Fetch Data
         fetcher = DBFetcher()
@@ -41,46 +90,22 @@ async def lifespan(app: FastAPI):
         data_context["latest_date"] = full_df['deliveryDate'].max()
         
         prep = Preprocessor()
+        # Daily demand and spend series, aggregated in one pass
+        demand_series, spend_series = prep.prepare_arima_pair(full_df, 'demand', 'totalCost')
 
-        # 3. Train Demand ARIMA
-        print("Training Demand Model...")
-        try:
-            demand_series = prep.prepare_arima_data(full_df, 'demand')
-            demand_model = ArimaModel(order=(5,1,0))
-            if demand_model.train(demand_series):
-                models["demand"] = demand_model
-                models["demand_history"] = demand_series
-                print("Demand Model Trained.")
-            else:
-                print("Demand Model Failed to Train.")
-        except Exception as e:
-            print(f"FAILED Demand Model: {e}")
-
-        # 4. Train Spend ARIMA
-        print("Training Spend Model...")
-        try:
-            spend_series = prep.prepare_arima_data(full_df, 'totalCost')
-            spend_model = ArimaModel(order=(5,1,0))
-            if spend_model.train(spend_series):
-                models["spend"] = spend_model
-                models["spend_history"] = spend_series
-                print("Spend Model Trained.")
-            else:
-                print("Spend Model Failed to Train.")
-        except Exception as e:
-            print(f"FAILED Spend Model: {e}")
-
-        # 5. Train Reliability RF
-        print("Training Reliability Model...")
-        try:
-            X, y, identifiers = prep.prepare_rf_data(full_df)
-            rf_model = SupplierReliabilityModel()
-            metrics = rf_model.train(X, y)
-            models["reliability"] = rf_model
-            data_context["rf_accuracy"] = metrics['accuracy']
-            print(f"RF Accuracy: {metrics['accuracy']:.2f}")
-        except Exception as e:
-             print(f"FAILED Reliability Model: {e}")
+        # 3. Train Demand ARIMA, Spend ARIMA and Reliability RF concurrently.
+        # sklearn releases the GIL in its native code; the ARIMA MLE fits
+        # mostly don't, so they run in their own processes (spawned, since
+        # forking while training threads run is unsafe).
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as arima_pool, \
+                ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(_train_demand, demand_series, arima_pool),
+                executor.submit(_train_spend, spend_series, arima_pool),
+                executor.submit(_train_rf, prep, full_df),
+            ]
+            for future in as_completed(futures):
+                future.result()
 
         print("ML Service Ready.")
         yield
@@ -88,9 +113,11 @@ async def lifespan(app: FastAPI):
         print(f"Startup Error: {e}")
         yield
     finally:
+        if fetcher is not None:
+            fetcher.close()
         print("Shutting down...")
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 class ForecastRequest(BaseModel):
     days: int = 30
@@ -105,8 +132,22 @@ class ReliabilityRequest(BaseModel):
     day_of_week: int
 
 def safe_float(val):
-    if pd.isna(val) or np.isnan(val): return 0.0
-    return float(val)
+    f = float(val)
+    if isnan(f) or not isfinite(f): return 0.0
+    return f
+
+def format_forecast(forecast):
+    """Zip forecast arrays into per-day rows starting the day after the latest delivery."""
+    start_date = data_context["latest_date"] + pd.Timedelta(days=1)
+    dates = pd.date_range(start_date, periods=len(forecast['mean']), freq='D')
+    dates = np.datetime_as_string(dates.to_numpy().astype('datetime64[s]'), unit='s').tolist()
+    mean = np.nan_to_num(np.maximum(0, forecast['mean']), nan=0.0, posinf=0.0, neginf=0.0) # No negative demand
+    lower = np.nan_to_num(np.maximum(0, forecast['lower']), nan=0.0, posinf=0.0, neginf=0.0)
+    upper = np.nan_to_num(forecast['upper'], nan=0.0, posinf=0.0, neginf=0.0)
+    return [
+        {"date": d, "value": m, "lower": l, "upper": u}
+        for d, m, l, u in zip(dates, mean.tolist(), lower.tolist(), upper.tolist())
+    ]
 
 @app.get("/health")
 def health_check():
@@ -127,17 +168,7 @@ def forecast_demand(req: ForecastRequest):
         insight = model.generate_insight(history, forecast, "Demand")
         
         # Format for frontend
-        output = []
-        start_date = data_context["latest_date"] + pd.Timedelta(days=1)
-        
-        for i, row in forecast.iterrows():
-            date = start_date + pd.Timedelta(days=i)
-            output.append({
-                "date": date.isoformat(),
-                "value": safe_float(max(0, row['mean'])), # No negative demand
-                "lower": safe_float(max(0, row['lower'])),
-                "upper": safe_float(row['upper'])
-            })
+        output = format_forecast(forecast)
             
         return {
             "forecast": output,
@@ -157,17 +188,8 @@ def forecast_spend(req: ForecastRequest):
         history = models["spend_history"]
         insight = model.generate_insight(history, forecast, "Procurement Spend")
         
-        output = []
-        start_date = data_context["latest_date"] + pd.Timedelta(days=1)
-        
-        for i, row in forecast.iterrows():
-            date = start_date + pd.Timedelta(days=i)
-            output.append({
-                "date": date.isoformat(),
-                "value": safe_float(max(0, row['mean'])),
-                "lower": safe_float(max(0, row['lower'])),
-                "upper": safe_float(row['upper'])
-            })
+        # Format for frontend
+        output = format_forecast(forecast)
             
         return {
             "forecast": output,
@@ -178,77 +200,79 @@ def forecast_spend(req: ForecastRequest):
         raise HTTPException(500, str(e))
 
 @app.post("/predict/supplier-reliability")
-def predict_reliability(items: List[dict]): 
+def predict_reliability(items: List[ReliabilityRequest]): 
     model = models.get("reliability")
     if not model: raise HTTPException(503, "Model not ready")
+    if not model.feature_names: raise HTTPException(503, "Model features not ready")
     
-    # We will ignore the input body mostly and return the "Current Risk Report"
-    # This aligns better with the dashboard request "SupplierReliabilityTable"
-    
-    try:
-        if not hasattr(model, 'feature_names') or not model.feature_names:
-             raise HTTPException(503, "Model features not ready")
-
-        pass
+    predictions = []
+    if items:
+        rows = pd.DataFrame([item.model_dump() for item in items])
+        # Encode IDs with the mappings learned at training time (unknown -> -1)
+        features = pd.DataFrame({
+            'vehicle_encoded': model.encode_ids(rows['vehicleId'], model.vehicle_mapping),
+            'origin_encoded': model.encode_ids(rows['originId'], model.origin_mapping),
+            'distance': rows['distance'].to_numpy(),
+            'demand': rows['demand'].to_numpy(),
+            'is_alpine_int': rows['isAlpine'].to_numpy(dtype=np.int8),
+            'day_of_week': rows['day_of_week'].to_numpy(dtype=np.int8),
+            'month': rows['month'].to_numpy(dtype=np.int8)
+        })[model.feature_names]
         
-    except Exception as e:
-        pass
+        probs = model.predict_proba(features)
+        narratives = model.generate_risk_narratives_batch(features, probs)
+        predictions = [
+            {"vehicleId": v, "originId": o, "score": round(p * 100, 1), "insight": n}
+            for v, o, p, n in zip(rows['vehicleId'], rows['originId'], probs.tolist(), narratives)
+        ]
     
     return {
         "accuracy": data_context["rf_accuracy"],
-        "records_trained": data_context["total_records"]
+        "records_trained": data_context["total_records"],
+        "predictions": predictions
     }
 
 @app.get("/model/performance")
 def model_performance():
     return {
-        "arima_demand_aic": models["demand"].model_fit.aic if models.get("demand") and models["demand"].model_fit else 0,
-        "arima_spend_aic": models["spend"].model_fit.aic if models.get("spend") and models["spend"].model_fit else 0,
+        "arima_demand_aic": safe_float(models["demand"].model_fit.aic) if models.get("demand") and models["demand"].model_fit else 0,
+        "arima_spend_aic": safe_float(models["spend"].model_fit.aic) if models.get("spend") and models["spend"].model_fit else 0,
         "rf_accuracy": data_context["rf_accuracy"],
         "data_points": data_context["total_records"]
     }
 
-# Endpoint to return ranked reliability list for the dashboard
-@app.get("/predict/dashboard-reliability")
-def dashboard_reliability():
-    model = models["reliability"]
-    if not model: raise HTTPException(503, "Model not ready")
-    
-    # Create synthetic test scenarios
-    scenarios = [
-        {"name": "Vienna Hub -> Salzburg (Mountain)", "is_alpine_int": 1, "distance": 320, "vehicle_encoded": 0},
-        {"name": "Graz Inner City (Van)", "is_alpine_int": 0, "distance": 15, "vehicle_encoded": 1},
-        {"name": "Innsbruck -> Munich (Long Haul)", "is_alpine_int": 1, "distance": 180, "vehicle_encoded": 2},
-        {"name": "Vienna Local Distribution", "is_alpine_int": 0, "distance": 45, "vehicle_encoded": 0},
-        {"name": "Klagenfurt -> Villach", "is_alpine_int": 0, "distance": 40, "vehicle_encoded": 1},
-    ]
+# Synthetic test scenarios for the dashboard
+DASHBOARD_SCENARIOS = [
+    {"name": "Vienna Hub -> Salzburg (Mountain)", "is_alpine_int": 1, "distance": 320, "vehicle_encoded": 0},
+    {"name": "Graz Inner City (Van)", "is_alpine_int": 0, "distance": 15, "vehicle_encoded": 1},
+    {"name": "Innsbruck -> Munich (Long Haul)", "is_alpine_int": 1, "distance": 180, "vehicle_encoded": 2},
+    {"name": "Vienna Local Distribution", "is_alpine_int": 0, "distance": 45, "vehicle_encoded": 0},
+    {"name": "Klagenfurt -> Villach", "is_alpine_int": 0, "distance": 40, "vehicle_encoded": 1},
+]
+
+def _score_dashboard(model, dt, probs=None):
+    """Rank the dashboard scenarios for day dt; probs overrides model scoring."""
+    scenarios = DASHBOARD_SCENARIOS
     
     results = []
-    import datetime
-    dt = datetime.datetime.now()
     
-    for s in scenarios:
-        features = [
-            s["vehicle_encoded"], 
-            0, # Mock origin
-            s["distance"], 
-            150, # Avg demand
-            s["is_alpine_int"],
-            dt.weekday(),
-            dt.month
-        ]
-        
-        # Reshape for sklearn
-        try:
-            prob = model.model.predict_proba([features])[0][1] # Prob of class 1 (On Time)
-        except:
-            prob = 0.85 # Fallback if shape mismatch
-        
-        narrative = model.generate_risk_narrative(
-            {"is_alpine_int": s["is_alpine_int"], "distance": s["distance"], "month": dt.month, "day_of_week": dt.weekday()}, 
-            prob
-        )
-        
+    rows = pd.DataFrame({
+        'vehicle_encoded': [s["vehicle_encoded"] for s in scenarios],
+        'origin_encoded': 0, # Mock origin
+        'distance': [s["distance"] for s in scenarios],
+        'demand': 150, # Avg demand
+        'is_alpine_int': [s["is_alpine_int"] for s in scenarios],
+        'day_of_week': dt.weekday(),
+        'month': dt.month
+    })
+    
+    # Score all scenarios in one call; only this step depends on the model's feature layout
+    if probs is None:
+        probs = model.model.predict_proba(rows[model.feature_names])[:, 1] # Prob of class 1 (On Time)
+    
+    narratives = model.generate_risk_narratives_batch(rows, probs)
+    
+    for s, prob, narrative in zip(scenarios, probs, narratives):
         results.append({
             "route": s["name"],
             "score": round(prob * 100, 1),
@@ -256,3 +280,26 @@ def dashboard_reliability():
         })
         
     return sorted(results, key=lambda x: x["score"])
+
+@lru_cache(maxsize=32)
+def _dashboard_payload(date_key, model_version):
+    """
+    Score the dashboard scenarios for one day and one trained model.
+    Only the weekday/month features change, so results are cached per
+    (date ordinal, model version); each retrain bumps the version.
+    Scoring errors propagate, so they are never cached.
+    """
+    return _score_dashboard(models["reliability"], datetime.date.fromordinal(date_key))
+
+# Endpoint to return ranked reliability list for the dashboard
+@app.get("/predict/dashboard-reliability")
+def dashboard_reliability():
+    model = models["reliability"]
+    if not model: raise HTTPException(503, "Model not ready")
+    
+    today = datetime.date.today()
+    try:
+        return _dashboard_payload(today.toordinal(), data_context["reliability_version"])
+    except Exception:
+        # Fallback if shape mismatch; served uncached so the next request retries
+        return _score_dashboard(model, today, probs=np.full(len(DASHBOARD_SCENARIOS), 0.85))
@@ -1,17 +1,52 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
+import joblib
+from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.tsa.stattools import adfuller
+from pmdarima import auto_arima, ARIMA as PmdARIMA
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache"
+MAX_CACHE_FILES = 8 # newest arima_*.pkl entries kept; older ones are pruned on write
+
+def fit_arima(values, start, order=None):
+    """
+    Fit ARIMA on a daily series given as raw values + start date.
+    If order is None, it is selected once with pmdarima's stepwise auto_arima.
+    Module-level so it can run in a worker process; returns (order, trend, params)
+    for the caller to rebuild the results with SARIMAX(...).filter(params).
+    """
+    series = pd.Series(values, index=pd.date_range(start, periods=len(values), freq='D'))
+    if order is None:
+        # The search already fits the winning order; reuse its params rather than refitting
+        fitted = auto_arima(
+            series, seasonal=False, stepwise=True, max_order=5,
+            suppress_warnings=True, error_action='ignore'
+        )
+    else:
+        # Match statsmodels' ARIMA default: a constant only for undifferenced
+        # series (d=0); with d>0 pmdarima's default intercept would add drift
+        fitted = PmdARIMA(order=order, with_intercept=order[1] == 0, suppress_warnings=True).fit(series)
+    model_fit = fitted.arima_res_
+    return tuple(fitted.order), model_fit.model.trend, model_fit.params.to_numpy()
 
 class ArimaModel:
-    def __init__(self, order=(5, 1, 0)):
+    def __init__(self, order=None):
+        # Requested order (part of the cache key); None: choose (p,d,q) with
+        # auto_arima on first training
         self.order = order
+        self.selected_order = None # order actually in use once trained
         self.model = None
         self.model_fit = None
 
-    def train(self, series):
+    def train(self, series, executor=None):
         """
         Train ARIMA model on a pandas Series (index=date, value=float).
+        If an executor (e.g. ProcessPoolExecutor) is given, the order search and
+        MLE fit run there.
         Returns True if successful, False otherwise.
         """
         # Ensure frequency is set
@@ -19,26 +54,75 @@ class ArimaModel:
             series = series.asfreq('D').fillna(0)
             
         try:
-            # Try primary order
-            try:
-                self.model = ARIMA(series, order=self.order)
-                self.model_fit = self.model.fit()
-            except Exception as e:
-                print(f"Primary ARIMA{self.order} failed: {e}. Retrying with (1,1,0)...")
-                # Fallback to simpler model
-                self.model = ARIMA(series, order=(1,1,0))
-                self.model_fit = self.model.fit()
-            
+            # Reuse the selected order and fitted params from a previous run on
+            # the same series: a single Kalman filter pass instead of the order
+            # search and MLE optimization
+            cache_path = self._cache_path(series)
+            cached = self._load_cache(cache_path)
+            if cached is not None:
+                order, trend, params = cached['order'], cached['trend'], cached['params']
+            else:
+                args = (series.to_numpy(dtype=np.float64), series.index[0], self.order)
+                if executor is not None:
+                    order, trend, params = executor.submit(fit_arima, *args).result()
+                else:
+                    order, trend, params = fit_arima(*args)
+                self._save_cache(cache_path, {'order': order, 'trend': trend, 'params': params})
+
+            # Same state-space model pmdarima estimated, so its params apply as-is
+            self.model = SARIMAX(series, order=order, trend=trend)
+            self.model_fit = self.model.filter(params)
+            self.selected_order = order
             return True
         except Exception as e:
             print(f"ARIMA Training Error: {e}")
             self.model_fit = None
             return False
 
+    def _load_cache(self, cache_path):
+        """Cached {'order', 'trend', 'params'} for this series, or None if missing/unreadable."""
+        if not cache_path.exists():
+            return None
+        try:
+            cached = joblib.load(cache_path)
+            if not isinstance(cached, dict) or not {'order', 'trend', 'params'} <= cached.keys():
+                raise ValueError("unexpected cache contents")
+            return cached
+        except Exception as e:
+            print(f"ARIMA cache unreadable ({cache_path.name}): {e}. Refitting...")
+            return None
+
+    def _save_cache(self, cache_path, payload):
+        """Write the cache atomically; failures are logged, never raised."""
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            CACHE_DIR.mkdir(exist_ok=True)
+            joblib.dump(payload, tmp_path, compress=3)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"ARIMA cache write failed ({cache_path.name}): {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._prune_cache()
+
+    def _prune_cache(self):
+        """Drop all but the newest MAX_CACHE_FILES entries (stale series after data changes)."""
+        try:
+            entries = sorted(CACHE_DIR.glob("arima_*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for stale in entries[MAX_CACHE_FILES:]:
+                stale.unlink(missing_ok=True)
+        except Exception as e:
+            print(f"ARIMA cache prune failed: {e}")
+
+    def _cache_path(self, series):
+        """Cache file for fitted params, keyed by series values and requested order."""
+        key = hashlib.sha1(np.ascontiguousarray(series.values).tobytes() + str(self.order).encode()).hexdigest()
+        return CACHE_DIR / f"arima_{key}.pkl"
+
     def forecast(self, steps=30):
         """
         Generate forecast for N steps.
-        Returns DataFrame with 'mean', 'confidence_lower', 'confidence_upper'.
+        Returns dict of numpy arrays: 'mean', 'lower', 'upper'.
         """
         if not self.model_fit:
             raise ValueError("Model not trained yet.")
@@ -46,14 +130,9 @@ class ArimaModel:
         forecast_result = self.model_fit.get_forecast(steps=steps)
         summary_frame = forecast_result.summary_frame()
         
-        # Renaissance of dataframe columns
-        df = pd.DataFrame({
-            'mean': summary_frame['mean'],
-            'lower': summary_frame['mean_ci_lower'],
-            'upper': summary_frame['mean_ci_upper']
-        })
+        mean, lower, upper = summary_frame[['mean', 'mean_ci_lower', 'mean_ci_upper']].to_numpy(dtype=np.float64).T
         
-        return df
+        return {'mean': mean, 'lower': lower, 'upper': upper}
 
     def generate_insight(self, history, forecast, metric_name="Demand"):
         """
@@ -74,12 +153,13 @@ class ArimaModel:
         if abs(change_pct) > 20: magnitude = "significantly"
         elif abs(change_pct) > 50: magnitude = "drastically"
         
-        # Identify peak day in forecast
-        peak_idx = forecast['mean'].idxmax()
-        peak_val = forecast['mean'].max()
+        # Identify peak day in forecast (forecast starts the day after history ends)
+        peak_pos = int(np.nanargmax(forecast['mean']))
+        peak_val = forecast['mean'][peak_pos]
+        peak_idx = history.index[-1] + pd.Timedelta(days=peak_pos + 1)
         peak_date_str = peak_idx.strftime('%b %d')
         
-        insight = f"{metric_name} is projected to {trend} {magnitude} ({change_pct:+.1f}%) over the next {len(forecast)} days. "
+        insight = f"{metric_name} is projected to {trend} {magnitude} ({change_pct:+.1f}%) over the next {len(forecast['mean'])} days. "
         
         if trend == "increasing":
             insight += f"Prepare for a peak of {int(peak_val)} units around {peak_date_str}. "